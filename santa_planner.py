@@ -6,11 +6,146 @@ Optimizes Santa's delivery route considering sleigh capacity constraints
 
 import pandas as pd
 import numpy as np
-from typing import List, Tuple, Dict
+from typing import List, Tuple, Dict, Optional
 import json
 from datetime import datetime
 from math import radians, sin, cos, sqrt, atan2
 
+try:
+    from numba import njit
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+try:
+    from joblib import Parallel, delayed
+    HAS_JOBLIB = True
+except ImportError:
+    HAS_JOBLIB = False
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
+
+def write_json(data, output_file: str):
+    """Write data to a JSON file with 2-space indentation, using orjson when available"""
+    if HAS_ORJSON:
+        with open(output_file, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open(output_file, 'w') as f:
+            json.dump(data, f, indent=2)
+
+
+def _greedy_trips_kernel(D: np.ndarray, weights: np.ndarray, volumes: np.ndarray,
+                         max_weight: float, max_volume: float,
+                         start_idx: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Greedy nearest-neighbor clustering of children into capacity-limited trips
+    Returns the visiting order of all children and the end offset of each trip in it
+    """
+    n = weights.shape[0]
+    remaining = np.ones(n, dtype=np.bool_)
+    order = np.empty(n, dtype=np.int64)
+    trip_ends = np.empty(n, dtype=np.int64)
+    n_placed = 0
+    n_trips = 0
+
+    while n_placed < n:
+        # Start a new trip from North Pole
+        trip_start = n_placed
+        current = start_idx
+        trip_weight = 0.0
+        trip_volume = 0.0
+
+        while True:
+            # Find the nearest remaining child whose present still fits
+            best = -1
+            best_dist = np.inf
+            for i in range(n):
+                if (remaining[i]
+                        and trip_weight + weights[i] <= max_weight
+                        and trip_volume + volumes[i] <= max_volume
+                        and D[current, i] < best_dist):
+                    best = i
+                    best_dist = D[current, i]
+
+            if best < 0:
+                # Can't add any more children to this trip
+                break
+
+            order[n_placed] = best
+            n_placed += 1
+            trip_weight += weights[best]
+            trip_volume += volumes[best]
+            current = best
+            remaining[best] = False
+
+        if n_placed == trip_start:
+            raise ValueError("Remaining children's wishes do not fit in an empty sleigh")
+
+        trip_ends[n_trips] = n_placed
+        n_trips += 1
+
+    return order, trip_ends[:n_trips]
+
+
+def _two_opt_kernel(tour: np.ndarray, D: np.ndarray) -> np.ndarray:
+    """
+    Improve a closed tour with 2-opt moves until no move shortens it
+    The first and last entries (the North Pole) stay in place
+    """
+    tour = tour.copy()
+    n = tour.shape[0]
+    improved = True
+
+    while improved:
+        improved = False
+        for i in range(1, n - 2):
+            for j in range(i + 1, n - 1):
+                a, b = tour[i - 1], tour[i]
+                c, d = tour[j], tour[j + 1]
+                # Sum in float64 so rounding in a float32 matrix cannot make a move look like a gain
+                delta = (np.float64(D[a, c]) + np.float64(D[b, d])
+                         - np.float64(D[a, b]) - np.float64(D[c, d]))
+                if delta < -1e-9:
+                    # Reverse the segment between the two swapped edges
+                    tour[i:j + 1] = tour[i:j + 1][::-1].copy()
+                    improved = True
+
+    return tour
+
+
+def _optimize_tour(positions: np.ndarray, D: np.ndarray, start_idx: int) -> np.ndarray:
+    """
+    Order one trip with nearest neighbor followed by 2-opt, starting and ending at start_idx
+    Takes plain arrays so trips can be optimized concurrently in worker threads
+    """
+    unvisited = np.ones(len(positions), dtype=bool)
+    tour = [start_idx]
+    current_idx = start_idx
+
+    while unvisited.any():
+        # Find nearest child not visited yet
+        distances = np.where(unvisited, D[current_idx, positions], np.inf)
+        nearest_pos = int(np.argmin(distances))
+
+        unvisited[nearest_pos] = False
+        current_idx = positions[nearest_pos]
+        tour.append(current_idx)
+
+    tour.append(start_idx)
+
+    return _two_opt_kernel(np.array(tour, dtype=np.int64), D)[1:-1]
+
+
+if HAS_NUMBA:
+    _greedy_trips_kernel = njit(cache=True)(_greedy_trips_kernel)
+    _two_opt_kernel = njit(cache=True, nogil=True)(_two_opt_kernel)
+
 
 class SantaPlanner:
     def __init__(self, excel_file: str):
@@ -20,14 +155,18 @@ class SantaPlanner:
 
     def load_data(self):
         """Load all data from Excel sheets"""
-        # Load children data
-        self.children = pd.read_excel(self.excel_file, sheet_name='Sample Input')
+        # Parse the workbook once and read every sheet from it
+        with pd.ExcelFile(self.excel_file, engine='openpyxl') as workbook:
+            # Load children data (compact integer columns for the id/wish arrays used in hot loops)
+            self.children = pd.read_excel(workbook, sheet_name='Sample Input')
+            self.children = self.children.astype({'child': 'int32', 'wish': 'int32', 'naughty': 'int8'})
+
+            # Load articles data
+            self.articles = pd.read_excel(workbook, sheet_name='Articles')
 
-        # Load articles data
-        self.articles = pd.read_excel(self.excel_file, sheet_name='Articles')
+            # Load slay metadata
+            meta_df = pd.read_excel(workbook, sheet_name='Slay Meta Data')
 
-        # Load slay metadata
-        meta_df = pd.read_excel(self.excel_file, sheet_name='Slay Meta Data')
         self.max_weight = meta_df[meta_df['meta data'] == 'maximum weight']['value'].values[0]
         self.max_volume = meta_df[meta_df['meta data'] == 'maximum volume']['value'].values[0]
         self.speed_kmh = meta_df[meta_df['meta data'] == 'speed (km/h)']['value'].values[0]
@@ -36,8 +175,38 @@ class SantaPlanner:
         # North Pole coordinates
         self.north_pole = (90.0, 0.0)
 
-        # Filter out naughty children
-        self.good_children = self.children[self.children['naughty'] == 0].copy()
+        # Filter out naughty children (positional index so it lines up with the arrays below)
+        self.good_children = self.children[self.children['naughty'] == 0].reset_index(drop=True)
+
+        # Column arrays of the good children, indexed by position
+        self.ids = self.good_children['child'].to_numpy()
+        self.lats = self.good_children['latitude'].to_numpy()
+        self.lons = self.good_children['longitude'].to_numpy()
+        self.wishes = self.good_children['wish'].to_numpy()
+
+        # Position of each good child by child id (-1 for ids that are not good children)
+        self._pos_by_id = np.full(int(self.children['child'].max()) + 1, -1)
+        self._pos_by_id[self.ids] = np.arange(len(self.ids))
+
+        # Article weight/volume lookup tables indexed by article id (unknown articles weigh nothing)
+        n_articles = int(max(self.articles['article'].max(), self.children['wish'].max())) + 1
+        self.weight_of = np.zeros(n_articles)
+        self.volume_of = np.zeros(n_articles)
+        self.weight_of[self.articles['article'].to_numpy()] = self.articles['weight'].to_numpy()
+        self.volume_of[self.articles['article'].to_numpy()] = self.articles['volume'].to_numpy()
+
+        # Load each good child adds to the sleigh
+        self.child_weight = self.weight_of[self.wishes]
+        self.child_volume = self.volume_of[self.wishes]
+
+        # Coordinates in radians for vectorized distance calculations (float32 is ample for km distances)
+        self._lat_rad = np.radians(self.lats).astype(np.float32)
+        self._lon_rad = np.radians(self.lons).astype(np.float32)
+        self._cos_lat = np.cos(self._lat_rad)
+
+        # Pairwise distances between all good children, North Pole as the last row/column
+        self.north_pole_idx = len(self.good_children)
+        self.D = self.build_distance_matrix()
 
         print(f"Loaded {len(self.children)} children ({len(self.good_children)} good, {len(self.children) - len(self.good_children)} naughty)")
         print(f"Sleigh capacity: {self.max_weight}kg, {self.max_volume} volume units")
@@ -61,29 +230,74 @@ class SantaPlanner:
 
         return radius * c
 
+    def haversine_vector(self, lat_arr: np.ndarray, lon_arr: np.ndarray,
+                         lat0: float, lon0: float,
+                         cos_lat_arr: Optional[np.ndarray] = None,
+                         cos_lat0: Optional[float] = None) -> np.ndarray:
+        """
+        Calculate the great circle distances from one point to many points (in km)
+        All coordinates are in radians; cosines of the latitudes can be passed in if precomputed
+        """
+        if cos_lat_arr is None:
+            cos_lat_arr = np.cos(lat_arr)
+        if cos_lat0 is None:
+            cos_lat0 = np.cos(lat0)
+
+        dlat = lat_arr - lat0
+        dlon = lon_arr - lon0
+
+        a = np.sin(dlat/2)**2 + cos_lat0 * cos_lat_arr * np.sin(dlon/2)**2
+
+        # Earth's radius in km
+        return 2 * 6371 * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+    def build_distance_matrix(self, block_size: int = 1024) -> np.ndarray:
+        """
+        Precompute the distance matrix (in km) for all good children plus the North Pole
+        Rows are computed in blocks to keep the temporary arrays small
+        """
+        lat = np.append(self._lat_rad, np.float32(radians(self.north_pole[0])))
+        lon = np.append(self._lon_rad, np.float32(radians(self.north_pole[1])))
+        cos_lat = np.append(self._cos_lat, np.cos(lat[-1]))
+        n = len(lat)
+
+        D = np.empty((n, n), dtype=np.float32)
+        for start in range(0, n, block_size):
+            stop = min(start + block_size, n)
+            D[start:stop] = self.haversine_vector(lat[None, :], lon[None, :],
+                                                  lat[start:stop, None], lon[start:stop, None],
+                                                  cos_lat[None, :], cos_lat[start:stop, None])
+
+        return D
+
     def get_article_info(self, article_id: int) -> Tuple[float, float]:
         """Get weight and volume for an article"""
-        article_row = self.articles[self.articles['article'] == article_id]
-        if len(article_row) == 0:
+        if not 0 <= article_id < len(self.weight_of):
             return 0.0, 0.0
-        return article_row['weight'].values[0], article_row['volume'].values[0]
+        return self.weight_of[article_id], self.volume_of[article_id]
 
     def calculate_load_requirements(self, children_subset: pd.DataFrame) -> Dict[int, int]:
-        """Calculate how many of each article we need for a subset of children"""
-        wish_counts = children_subset['wish'].value_counts().to_dict()
-        return wish_counts
+        """Calculate how many of each article we need for a subset of children (ordered by article id)"""
+        article_ids, counts = self._article_counts(children_subset['wish'].to_numpy())
+        return dict(zip(article_ids.tolist(), counts.tolist()))
 
-    def can_fit_in_sleigh(self, article_counts: Dict[int, int]) -> bool:
-        """Check if the given articles can fit in the sleigh"""
-        total_weight = 0
-        total_volume = 0
+    def _article_counts(self, wishes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Wished article ids in ascending order and how many pieces of each are needed"""
+        counts = np.bincount(wishes, minlength=len(self.weight_of))
+        article_ids = np.nonzero(counts)[0]
+        return article_ids, counts[article_ids]
 
-        for article_id, count in article_counts.items():
-            weight, volume = self.get_article_info(article_id)
-            total_weight += weight * count
-            total_volume += volume * count
+    def _good_child_positions(self, children_subset: pd.DataFrame) -> Optional[np.ndarray]:
+        """
+        Positions of the given children among the good children (rows of the distance matrix)
+        Returns None if any of them is not a good child
+        """
+        ids = children_subset['child'].to_numpy()
+        if len(ids) > 0 and (ids.min() < 0 or ids.max() >= len(self._pos_by_id)):
+            return None
 
-        return total_weight <= self.max_weight and total_volume <= self.max_volume
+        positions = self._pos_by_id[ids]
+        return None if (positions < 0).any() else positions
 
     def nearest_neighbor_from_point(self, start_coord: Tuple[float, float],
                                    remaining_children: pd.DataFrame) -> pd.DataFrame:
@@ -93,151 +307,255 @@ class SantaPlanner:
         if len(remaining_children) == 0:
             return pd.DataFrame()
 
+        # Works on the frame's own coordinates, so any subset of children can be ordered
+        lat_arr = np.radians(remaining_children['latitude'].to_numpy())
+        lon_arr = np.radians(remaining_children['longitude'].to_numpy())
+        cos_lat_arr = np.cos(lat_arr)
+        unvisited = np.ones(len(remaining_children), dtype=bool)
+
         ordered = []
-        current_coord = start_coord
-        remaining = remaining_children.copy()
-
-        while len(remaining) > 0:
-            # Calculate distances to all remaining children
-            distances = remaining.apply(
-                lambda row: self.haversine_distance(current_coord, (row['latitude'], row['longitude'])),
-                axis=1
-            )
+        current_lat, current_lon = radians(start_coord[0]), radians(start_coord[1])
+        current_cos_lat = cos(current_lat)
+
+        while unvisited.any():
+            # Calculate distances to all children, ignoring those already visited
+            distances = self.haversine_vector(lat_arr, lon_arr, current_lat, current_lon,
+                                              cos_lat_arr, current_cos_lat)
+            distances[~unvisited] = np.inf
 
             # Find nearest child
-            nearest_idx = distances.idxmin()
-            nearest_child = remaining.loc[nearest_idx]
+            nearest_pos = int(np.argmin(distances))
 
-            ordered.append(nearest_child)
-            current_coord = (nearest_child['latitude'], nearest_child['longitude'])
-            remaining = remaining.drop(nearest_idx)
+            ordered.append(nearest_pos)
+            unvisited[nearest_pos] = False
+            current_lat, current_lon = lat_arr[nearest_pos], lon_arr[nearest_pos]
+            current_cos_lat = cos_lat_arr[nearest_pos]
 
-        return pd.DataFrame(ordered)
+        return remaining_children.iloc[ordered]
 
     def greedy_cluster_by_capacity(self) -> List[pd.DataFrame]:
         """
         Cluster children into trips based on sleigh capacity using greedy approach
         """
-        remaining = self.good_children.copy()
+        return [self.good_children.iloc[trip_idx] for trip_idx in self._greedy_trip_indices()]
+
+    def _greedy_trip_indices(self) -> List[np.ndarray]:
+        """Greedy clustering as positions of the good children in each trip"""
+        if HAS_NUMBA:
+            order, trip_ends = _greedy_trips_kernel(self.D, self.child_weight, self.child_volume,
+                                                    float(self.max_weight), float(self.max_volume),
+                                                    self.north_pole_idx)
+            if len(trip_ends) == 0:
+                # No good children, so no trips
+                return []
+            return np.split(order, trip_ends[:-1])
+
+        return [np.array(trip_idx) for trip_idx in self._greedy_trip_indices_numpy()]
+
+    def _greedy_trip_indices_numpy(self) -> List[List[int]]:
+        """
+        NumPy fallback for the greedy clustering when numba is not installed
+        """
+        remaining_mask = np.ones(len(self.good_children), dtype=bool)
         trips = []
 
-        while len(remaining) > 0:
+        while remaining_mask.any():
             # Start a new trip from North Pole
-            current_trip = pd.DataFrame()
-            current_coord = self.north_pole
-            trip_remaining = remaining.copy()
+            trip_idx = []
+            current_idx = self.north_pole_idx
+            trip_weight, trip_volume = 0.0, 0.0
 
             # Try to add children to this trip using nearest neighbor
-            while len(trip_remaining) > 0:
-                # Calculate distances to all remaining children
-                distances = trip_remaining.apply(
-                    lambda row: self.haversine_distance(current_coord, (row['latitude'], row['longitude'])),
-                    axis=1
-                )
-
-                # Sort by distance
-                sorted_indices = distances.sort_values().index
-
-                # Try to add the nearest children that fit in capacity
-                added_any = False
-                for idx in sorted_indices:
-                    test_trip = pd.concat([current_trip, trip_remaining.loc[[idx]]])
-                    article_counts = self.calculate_load_requirements(test_trip)
-
-                    if self.can_fit_in_sleigh(article_counts):
-                        # Add this child
-                        current_trip = test_trip
-                        current_coord = (trip_remaining.loc[idx, 'latitude'],
-                                       trip_remaining.loc[idx, 'longitude'])
-                        trip_remaining = trip_remaining.drop(idx)
-                        added_any = True
-                        break
-
-                if not added_any:
+            while True:
+                # Remaining children whose present still fits in the sleigh
+                fits = (remaining_mask
+                        & (trip_weight + self.child_weight <= self.max_weight)
+                        & (trip_volume + self.child_volume <= self.max_volume))
+                candidates = np.where(fits)[0]
+
+                if len(candidates) == 0:
                     # Can't add any more children to this trip
                     break
 
-            # Save this trip
-            if len(current_trip) > 0:
-                trips.append(current_trip)
-                remaining = remaining.drop(current_trip.index)
+                # Add the nearest child that fits
+                idx = candidates[np.argmin(self.D[current_idx, candidates])]
+                trip_idx.append(idx)
+                trip_weight += self.child_weight[idx]
+                trip_volume += self.child_volume[idx]
+                current_idx = idx
+                remaining_mask[idx] = False
+
+            if not trip_idx:
+                raise ValueError("Remaining children's wishes do not fit in an empty sleigh")
+
+            trips.append(trip_idx)
+
+        return trips
+
+    def _sweep_trip_indices(self, start_angle: float) -> List[np.ndarray]:
+        """
+        Cluster children into trips by sweeping around the North Pole by longitude
+        Every trip starts at the pole, so longitude is the polar angle around the depot
+        Returns the positions of the good children in each trip
+        """
+        order = np.argsort((self.lons - start_angle) % 360, kind='stable')
+        trips = []
+        trip_idx = []
+        trip_weight, trip_volume = 0.0, 0.0
+
+        for idx in order:
+            if (trip_weight + self.child_weight[idx] > self.max_weight
+                    or trip_volume + self.child_volume[idx] > self.max_volume):
+                if not trip_idx:
+                    raise ValueError("Remaining children's wishes do not fit in an empty sleigh")
+
+                # Sleigh is full, start a new trip
+                trips.append(np.array(trip_idx))
+                trip_idx = []
+                trip_weight, trip_volume = 0.0, 0.0
+
+            trip_idx.append(idx)
+            trip_weight += self.child_weight[idx]
+            trip_volume += self.child_volume[idx]
+
+        if trip_idx:
+            trips.append(np.array(trip_idx))
 
         return trips
 
     def optimize_trip_route(self, trip: pd.DataFrame) -> pd.DataFrame:
         """
-        Optimize the route within a single trip using nearest neighbor
+        Optimize the route within a single trip using nearest neighbor followed by 2-opt
+        """
+        positions = self._good_child_positions(trip)
+        if positions is None:
+            # Not all good children, so the distance matrix does not cover them
+            return self.nearest_neighbor_from_point(self.north_pole, trip)
+
+        tour = _optimize_tour(positions, self.D, self.north_pole_idx)
+        return trip.iloc[pd.Index(positions).get_indexer(tour)]
+
+    def _tour_distance(self, positions: np.ndarray) -> float:
+        """Calculate the distance of a trip (in km) from the North Pole and back, given good-child positions in visiting order"""
+        tour = np.concatenate(([self.north_pole_idx], positions, [self.north_pole_idx]))
+        return float(self.D[tour[:-1], tour[1:]].sum(dtype=np.float64))
+
+    def plan_trips(self, n_sweeps: int = 36, n_jobs: int = -1) -> List[pd.DataFrame]:
+        """
+        Cluster first, route second: optimize the trips of the greedy clustering and of
+        sweeps from several start angles, and keep the plan with the shortest total distance
+        Trips are optimized in parallel threads with joblib when it is installed
+        (the compiled 2-opt kernel releases the GIL)
         """
-        return self.nearest_neighbor_from_point(self.north_pole, trip)
+        return [self.good_children.iloc[tour] for tour in self._plan_tours(n_sweeps, n_jobs)]
+
+    def _plan_tours(self, n_sweeps: int = 36, n_jobs: int = -1) -> List[np.ndarray]:
+        """Best plan from plan_trips as good-child positions of each trip in visiting order"""
+        # Work on positions only; DataFrames are built for the winning plan alone
+        candidates = [self._greedy_trip_indices()]
+        for start_angle in np.arange(n_sweeps) * 360 / n_sweeps:
+            candidates.append(self._sweep_trip_indices(start_angle))
+
+        # Every trip is an independent TSP, so optimize them all in one batch
+        all_trips = [positions for trips in candidates for positions in trips]
+        if HAS_JOBLIB and n_jobs != 1:
+            tours = Parallel(n_jobs=n_jobs, prefer='threads')(
+                delayed(_optimize_tour)(positions, self.D, self.north_pole_idx) for positions in all_trips
+            )
+        else:
+            tours = [_optimize_tour(positions, self.D, self.north_pole_idx) for positions in all_trips]
+
+        best_tours, best_distance = [], np.inf
+        offset = 0
+        for trips in candidates:
+            optimized_tours = tours[offset:offset + len(trips)]
+            offset += len(trips)
+
+            distance = sum(self._tour_distance(tour) for tour in optimized_tours)
+            if distance < best_distance:
+                best_tours, best_distance = optimized_tours, distance
+
+        return best_tours
 
     def generate_route_plan(self) -> List[Dict]:
         """
         Generate the complete route plan with refill stops
         """
-        trips = self.greedy_cluster_by_capacity()
+        tours = self._plan_tours()
 
-        print(f"\nGenerated {len(trips)} trips to deliver to {len(self.good_children)} children")
+        print(f"\nGenerated {len(tours)} trips to deliver to {len(self.good_children)} children")
 
         route_plan = []
 
-        for trip_num, trip in enumerate(trips, 1):
+        for trip_num, tour in enumerate(tours, 1):
             # Calculate required articles for this trip
-            article_counts = self.calculate_load_requirements(trip)
+            article_ids, counts = self._article_counts(self.wishes[tour])
 
             # Add refill instructions
-            for article_id, count in sorted(article_counts.items()):
+            for article_id, count in zip(article_ids, counts):
                 route_plan.append({
                     'stop': 0,
                     'article': float(article_id),
                     'pieces': float(count)
                 })
 
-            # Optimize route for this trip
-            optimized_trip = self.optimize_trip_route(trip)
-
             # Add delivery stops
-            for _, child in optimized_trip.iterrows():
+            for child_id in self.ids[tour]:
                 route_plan.append({
-                    'stop': int(child['child']),
+                    'stop': int(child_id),
                     'article': None,
                     'pieces': None
                 })
 
         return route_plan
 
+    def _stops_array(self, route_plan: List[Dict]) -> np.ndarray:
+        """Stop column of the route plan as an integer array (0 = North Pole refill)"""
+        return np.fromiter((stop['stop'] for stop in route_plan), dtype=np.int32, count=len(route_plan))
+
     def calculate_total_distance(self, route_plan: List[Dict]) -> float:
         """Calculate total distance traveled"""
-        total_distance = 0
-        current_coord = self.north_pole
-
-        for stop in route_plan:
-            if stop['stop'] == 0:
-                # Refill at North Pole - already here or need to return
-                if current_coord != self.north_pole:
-                    total_distance += self.haversine_distance(current_coord, self.north_pole)
-                    current_coord = self.north_pole
-            else:
-                # Delivery stop
-                child = self.good_children[self.good_children['child'] == stop['stop']].iloc[0]
-                child_coord = (child['latitude'], child['longitude'])
-                total_distance += self.haversine_distance(current_coord, child_coord)
-                current_coord = child_coord
+        return self._route_distance(self._stops_array(route_plan))
 
-        # Return to North Pole
-        total_distance += self.haversine_distance(current_coord, self.north_pole)
+    def _route_distance(self, stops: np.ndarray) -> float:
+        """Calculate total distance traveled for the stops of a route plan"""
+        # Refills are at the North Pole; repeated refills add zero-length legs
+        refill = stops == 0
+        in_range = (stops >= 0) & (stops < len(self._pos_by_id))
+        positions = np.where(in_range, self._pos_by_id[np.where(in_range, stops, 0)], -1)
 
-        return total_distance
+        invalid = ~refill & (positions < 0)
+        if invalid.any():
+            raise ValueError(f"Route stops are not good children: {sorted(set(stops[invalid].tolist()))}")
+
+        positions[refill] = 0
+        lat = np.radians(np.where(refill, self.north_pole[0], self.lats[positions]))
+        lon = np.radians(np.where(refill, self.north_pole[1], self.lons[positions]))
+
+        # Start from and return to the North Pole
+        lat = np.concatenate(([radians(self.north_pole[0])], lat, [radians(self.north_pole[0])]))
+        lon = np.concatenate(([radians(self.north_pole[1])], lon, [radians(self.north_pole[1])]))
+
+        cos_lat = np.cos(lat)
+        return float(self.haversine_vector(lat[1:], lon[1:], lat[:-1], lon[:-1],
+                                           cos_lat[1:], cos_lat[:-1]).sum())
 
     def calculate_total_time(self, route_plan: List[Dict]) -> float:
         """Calculate total time in hours"""
-        distance = self.calculate_total_distance(route_plan)
+        return self._summarize(route_plan)[2]
+
+    def _summarize(self, route_plan: List[Dict]) -> Tuple[float, int, float]:
+        """Calculate total distance (km), delivery stops and total time (hours) with a single route walk"""
+        stops = self._stops_array(route_plan)
+
+        distance = self._route_distance(stops)
         travel_time_hours = distance / self.speed_kmh
 
         # Count delivery stops (not refills)
-        delivery_stops = sum(1 for stop in route_plan if stop['stop'] != 0)
+        delivery_stops = int(np.count_nonzero(stops))
         stop_time_hours = (delivery_stops * self.time_per_stop_min) / 60
 
-        return travel_time_hours + stop_time_hours
+        return distance, delivery_stops, travel_time_hours + stop_time_hours
 
     def save_route_to_csv(self, route_plan: List[Dict], output_file: str):
         """Save route plan to CSV with semicolon separator and comma as decimal"""
@@ -253,22 +571,23 @@ class SantaPlanner:
 
     def save_statistics(self, route_plan: List[Dict], output_file: str):
         """Save statistics for the dashboard"""
+        distance, delivery_stops, total_time = self._summarize(route_plan)
+
         stats = {
             'total_children': int(len(self.children)),
             'good_children': int(len(self.good_children)),
             'naughty_children': int(len(self.children) - len(self.good_children)),
-            'total_stops': len([s for s in route_plan if s['stop'] != 0]),
-            'total_refills': len([s for s in route_plan if s['stop'] == 0]),
-            'total_distance_km': round(self.calculate_total_distance(route_plan), 2),
-            'total_time_hours': round(self.calculate_total_time(route_plan), 2),
+            'total_stops': delivery_stops,
+            'total_refills': len(route_plan) - delivery_stops,
+            'total_distance_km': round(distance, 2),
+            'total_time_hours': round(float(total_time), 2),
             'max_weight': float(self.max_weight),
             'max_volume': float(self.max_volume),
             'speed_kmh': float(self.speed_kmh),
             'generated_at': datetime.now().isoformat()
         }
 
-        with open(output_file, 'w') as f:
-            json.dump(stats, f, indent=2)
+        write_json(stats, output_file)
 
         print(f"Statistics saved to: {output_file}")
         print(f"\n{'='*60}")
@@ -331,14 +650,11 @@ def main():
     planner.save_statistics(route_plan, 'statistics.json')
 
     # Also save route plan as JSON for dashboard
-    with open('route_plan.json', 'w') as f:
-        json.dump(route_plan, f, indent=2)
+    write_json(route_plan, 'route_plan.json')
     print("Route plan JSON saved to: route_plan.json")
 
-    # Save children data as JSON for dashboard
-    children_data = planner.children.to_dict('records')
-    with open('children_data.json', 'w') as f:
-        json.dump(children_data, f, indent=2)
+    # Save children data as JSON for dashboard (serialized by pandas without building Python dicts)
+    planner.children.to_json('children_data.json', orient='records', indent=2)
     print("Children data saved to: children_data.json")
 
 